@@ -99,6 +99,11 @@ class ConsoleMaster(master.Master):
 
         self.loop.set_alarm_in(seconds, cb)
 
+    def input_filter(self, keys, raw):
+        if "window resize" in keys:
+            signals.window_resized.send()
+        return keys
+
     @contextlib.contextmanager
     def uistopped(self):
         self.loop.stop()
@@ -226,6 +231,7 @@ class ConsoleMaster(master.Master):
             event_loop=urwid.AsyncioEventLoop(loop=loop),
             screen=self.ui,
             handle_mouse=self.options.console_mouse,
+            input_filter=self.input_filter,
         )
         self.window = window.Window(self)
         self.loop.widget = self.window
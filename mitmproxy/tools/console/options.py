@@ -1,4 +1,8 @@
 from __future__ import annotations
+import asyncio
+import bisect
+import collections
+import logging
 from collections.abc import Sequence
 
 import urwid
@@ -14,63 +18,178 @@ from mitmproxy.tools.console import overlay
 
 HELP_HEIGHT = 5
 
+# Sequence options longer than this are formatted off the UI thread.
+ASYNC_FORMAT_THRESHOLD = 64
+ASYNC_FORMAT_PLACEHOLDER = "[… computing]"
+
+EDITABLE_TYPESPECS = frozenset([str, int, Optional[str], Optional[int]])
+
 
 def can_edit_inplace(opt):
     if opt.choices:
         return False
-    if opt.typespec in [str, int, Optional[str], Optional[int]]:
+    if opt.typespec in EDITABLE_TYPESPECS:
         return True
 
 
+# Option kinds, so that hot paths don't have to compare typing generics.
+KIND_BOOL = 0
+KIND_CHOICES = 1
+KIND_EDITABLE = 2
+KIND_SEQUENCE = 3
+KIND_OTHER = 4
+
+
+def option_kind(opt) -> int:
+    if opt.typespec == bool:
+        return KIND_BOOL
+    elif can_edit_inplace(opt):
+        return KIND_EDITABLE
+    elif opt.choices:
+        return KIND_CHOICES
+    elif opt.typespec == Sequence[str]:
+        return KIND_SEQUENCE
+    else:
+        return KIND_OTHER
+
+
+def format_sequence(seq: Sequence[str]) -> str:
+    """
+    Equivalent to pprint.pformat(seq, indent=1), but much faster for the
+    common case of a list of strings that each fit on a line.
+    """
+    if isinstance(seq, list) and all(isinstance(i, str) for i in seq):
+        items = [repr(i) for i in seq]
+        line = "[" + ", ".join(items) + "]"
+        if len(line) <= 80:
+            return line
+        if all(len(i) <= 78 for i in items):
+            return "[" + ",\n ".join(items) + "]"
+    return pprint.pformat(seq, indent=1)
+
+
 def fcol(s, width, attr):
     s = str(s)
     return ("fixed", width, urwid.Text((attr, s)))
 
 
+class AsciiText(urwid.Text):
+    """
+    A Text widget that skips urwid's character width calculations for
+    single-line printable ASCII text, which covers nearly all option values.
+    """
+
+    def _update_cache_translation(self, maxcol, ta):
+        text = ta[0] if ta else self.text
+        n = len(text)
+        if (
+            n <= maxcol
+            and self.align == urwid.LEFT
+            and text.isascii()
+            and text.isprintable()
+        ):
+            self._cache_maxcol = maxcol
+            self._cache_translation = [[(n, 0, n), (0, n)]] if n else [[(0, 0)]]
+        else:
+            super()._update_cache_translation(maxcol, ta)
+
+    def pack(self, size=None, focus=False):
+        text = self.text
+        if size is None and text.isascii() and text.isprintable():
+            return len(text), 1
+        return super().pack(size, focus)
+
+
 class OptionItem(urwid.WidgetWrap):
+    # Many items are created while scrolling. All instance state lives in
+    # slots, so CPython never has to materialize the inherited __dict__.
+    __slots__ = (
+        "walker",
+        "opt",
+        "focused",
+        "namewidth",
+        "editing",
+        "_w_cached",
+        "_valw_attrmap",
+    )
+    _w_cached: urwid.Columns | None
+
     def __init__(self, walker, opt, focused, namewidth, editing):
         self.walker, self.opt, self.focused = walker, opt, focused
         self.namewidth = namewidth
         self.editing = editing
+        self._valw_attrmap = None
         super().__init__(None)
-        self._w = self.get_widget()
 
-    def get_widget(self):
-        val = self.opt.current()
-        if self.opt.typespec == bool:
-            displayval = "true" if val else "false"
-        elif not val:
-            displayval = ""
-        elif self.opt.typespec == Sequence[str]:
-            displayval = pprint.pformat(val, indent=1)
-        else:
-            displayval = str(val)
+    def _get_wrapped(self) -> urwid.Columns:
+        # urwid fetches neighbouring rows that may never be drawn, so we only
+        # build the widget tree once it is actually rendered or measured.
+        if self._w_cached is None:
+            self._w_cached = self.get_widget()
+        return self._w_cached
 
-        changed = self.walker.master.options.has_changed(self.opt.name)
-        if self.focused:
-            valstyle = "option_active_selected" if changed else "option_selected"
-        else:
-            valstyle = "option_active" if changed else "text"
+    def _set_wrapped(self, w: urwid.Columns | None) -> None:
+        self._w_cached = w
 
-        if self.editing:
-            valw = urwid.Edit(edit_text=displayval)
-        else:
-            valw = urwid.AttrMap(
-                urwid.Padding(urwid.Text([(valstyle, displayval)])), valstyle
-            )
+    _wrapped_widget = property(_get_wrapped, _set_wrapped)
+    # Skip WidgetWrap's extra hop from _w to _wrapped_widget.
+    _w = property(_get_wrapped, _set_wrapped)
 
+    def get_widget(self):
         return urwid.Columns(
             [
-                (
-                    self.namewidth,
-                    urwid.Text([("title", self.opt.name.ljust(self.namewidth))]),
-                ),
-                valw,
+                (self.namewidth, self.walker.get_name_widget(self.opt.name)),
+                self.get_value_widget(),
             ],
             dividechars=2,
             focus_column=1,
         )
 
+    def get_valstyle(self):
+        _, changed = self.walker.get_display(self.opt)
+        if self.focused:
+            return "option_active_selected" if changed else "option_selected"
+        else:
+            return "option_active" if changed else "text"
+
+    def get_value_widget(self):
+        displayval, _ = self.walker.get_display(self.opt)
+        if self.editing:
+            self._valw_attrmap = None
+            return urwid.Edit(edit_text=displayval)
+        else:
+            # The style is applied by the AttrMap alone, so that set_focused
+            # only has to swap the attribute map.
+            self._valw_attrmap = self.walker.acquire_value_widget(
+                displayval, self.get_valstyle()
+            )
+            return self._valw_attrmap
+
+    def release(self) -> None:
+        """
+        Hand the value widget back to the walker's pool once this item is discarded.
+        """
+        if self._valw_attrmap is not None:
+            self.walker.release_value_widget(self._valw_attrmap)
+            self._valw_attrmap = None
+
+    def set_focused(self, focused: bool) -> None:
+        if focused == self.focused:
+            return
+        self.focused = focused
+        if self._valw_attrmap is not None:
+            self._valw_attrmap.set_attr_map({None: self.get_valstyle()})
+
+    def set_editing(self, editing: bool) -> None:
+        """
+        Switch between the edit and display widget, replacing only the value column.
+        """
+        if editing == self.editing:
+            return
+        self.editing = editing
+        if self._w_cached is not None:
+            self._w.contents[1] = (self.get_value_widget(), self._w.options())
+
     def get_edit_text(self):
         return self._w[1].get_edit_text()
 
@@ -93,61 +212,236 @@ class OptionListWalker(urwid.ListWalker):
         self.focusobj = None
 
         self.opts = sorted(master.options.keys())
-        self.maxlen = max(len(i) for i in self.opts)
+        self._keyset = frozenset(self.opts)
+        # The _Option objects for self.opts, by position. OptManager replaces
+        # its whole options dict on rollback, so we keep track of that as well.
+        self._options = master.options._options
+        self._opt_refs = [self._options[name] for name in self.opts]
+        self.kinds = {opt.name: option_kind(opt) for opt in self._opt_refs}
+        # Number of option names per name length, so that maxlen can be
+        # maintained as options come and go.
+        self._len_counts = collections.Counter(len(i) for i in self.opts)
+        self.maxlen = max(self._len_counts)
         self.editing = False
+        # Rendered OptionItems, keyed by position. The stored value identity
+        # guards against values that changed behind our back.
+        self._cache: dict[int, tuple[object, OptionItem]] = {}
+        # (value, displayval, changed) per option name, see get_display.
+        self._display_cache: dict[str, tuple[object, str, bool]] = {}
+        # Name columns never change for a given maxlen, so they are shared.
+        self._name_widgets: dict[str, urwid.Text] = {}
+        # Value widgets of discarded items, for reuse by new ones.
+        self._pool: list[urwid.AttrMap] = []
+        # Names of options that are currently being formatted in the background.
+        self._pending: set[str] = set()
+        self._dirty = False
         self.set_focus(0)
         self.master.options.changed.connect(self.sig_mod)
 
     def sig_mod(self, *args, **kwargs):
-        self.opts = sorted(self.master.options.keys())
-        self.maxlen = max(len(i) for i in self.opts)
+        # Bulk updates such as loading a config file fire this once per
+        # option. We only drop stale widgets here and resync on the next
+        # event loop turn, or earlier if urwid asks us for a widget.
+        # Display strings are validated against the stored value in
+        # get_display, so unchanged options keep theirs.
+        for _, item in self._cache.values():
+            item.release()
+        self._cache.clear()
+        if not self._dirty:
+            self._dirty = True
+            signals.call_in.send(seconds=0, callback=self._flush)
+
+    def _flush(self):
+        if not self._dirty:
+            return
+        self._dirty = False
+        # Most updates only change values, so avoid re-sorting unless the
+        # set of options itself has changed.
+        options = self.master.options._options
+        keys = options.keys()
+        keys_changed = keys != self._keyset
+        if keys_changed:
+            added, removed = keys - self._keyset, self._keyset - keys
+            maxlen = self.maxlen
+            for name in removed:
+                self.opts.pop(bisect.bisect_left(self.opts, name))
+                self._len_counts[len(name)] -= 1
+                if not self._len_counts[len(name)]:
+                    del self._len_counts[len(name)]
+                    if len(name) == maxlen:
+                        maxlen = max(self._len_counts)
+            for name in added:
+                bisect.insort(self.opts, name)
+                self._len_counts[len(name)] += 1
+                maxlen = max(maxlen, len(name))
+            self._keyset = frozenset(keys)
+
+            if maxlen != self.maxlen:
+                self.maxlen = maxlen
+                self._name_widgets.clear()
+        if keys_changed or options is not self._options:
+            self._options = options
+            self._opt_refs = [options[name] for name in self.opts]
+            self.kinds = {opt.name: option_kind(opt) for opt in self._opt_refs}
+        self.set_focus(min(self.index, len(self.opts) - 1))
+
+    def get_display(self, opt) -> tuple[str, bool]:
+        """
+        Returns the display string for an option and whether it differs
+        from its default. Formatting is memoized until the value changes.
+        """
+        cached = self._display_cache.get(opt.name)
+        if cached is not None and cached[0] is opt.value:
+            return cached[1], cached[2]
+
+        val = opt.current()
+        kind = self.kinds[opt.name]
+        if kind == KIND_BOOL:
+            displayval = "true" if val else "false"
+        elif not val:
+            displayval = ""
+        elif kind == KIND_SEQUENCE:
+            if len(val) > ASYNC_FORMAT_THRESHOLD and self._format_async(opt, val):
+                displayval = ASYNC_FORMAT_PLACEHOLDER
+            else:
+                displayval = format_sequence(val)
+        elif isinstance(val, str):
+            displayval = val
+        else:
+            displayval = str(val)
+
+        changed = self.master.options.has_changed(opt.name)
+        self._display_cache[opt.name] = (opt.value, displayval, changed)
+        return displayval, changed
+
+    def _format_async(self, opt, val) -> bool:
+        """
+        Format a long sequence value in a worker thread. Returns False if
+        there is no event loop to report back to.
+        """
+        if opt.name in self._pending:
+            return True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+        self._pending.add(opt.name)
+        # The loop's default executor is shut down together with the loop
+        # when mitmproxy exits, so we don't have to manage a pool ourselves.
+        fut = loop.run_in_executor(None, format_sequence, val)
+        value = opt.value
+        fut.add_done_callback(lambda f: self._format_done(opt, value, val, f))
+        return True
+
+    def _format_done(self, opt, value, val, fut) -> None:
+        self._pending.discard(opt.name)
+        if (
+            opt.value is not value
+            or self.master.options._options.get(opt.name) is not opt
+        ):
+            # The value changed in the meantime, the next render starts over.
+            self._display_cache.pop(opt.name, None)
+        else:
+            if fut.cancelled():
+                displayval = pprint.pformat(val, indent=1)
+            elif exc := fut.exception():
+                logging.error(f"Failed to format option {opt.name}: {exc}")
+                displayval = pprint.pformat(val, indent=1)
+            else:
+                displayval = fut.result()
+            changed = self.master.options.has_changed(opt.name)
+            self._display_cache[opt.name] = (value, displayval, changed)
+        pos = bisect.bisect_left(self.opts, opt.name)
+        cached = self._cache.pop(pos, None)
+        if cached is not None:
+            cached[1].release()
+        if pos == self.index:
+            self.set_focus(pos)
         self._modified()
-        self.set_focus(self.index)
+
+    def get_name_widget(self, name: str) -> urwid.Text:
+        w = self._name_widgets.get(name)
+        if w is None:
+            w = self._name_widgets[name] = urwid.Text(
+                [("title", name.ljust(self.maxlen))]
+            )
+        return w
+
+    def acquire_value_widget(self, displayval: str, style: str) -> urwid.AttrMap:
+        if self._pool:
+            w = self._pool.pop()
+            w.base_widget.set_text(displayval)
+            w.set_attr_map({None: style})
+            return w
+        return urwid.AttrMap(urwid.Padding(AsciiText(displayval)), style)
+
+    def release_value_widget(self, w: urwid.AttrMap) -> None:
+        self._pool.append(w)
 
     def start_editing(self):
         self.editing = True
-        self.focus_obj = self._get(self.index, True)
+        self.focus_obj.set_editing(True)
         self._modified()
 
     def stop_editing(self):
         self.editing = False
-        self.focus_obj = self._get(self.index, False)
-        self.set_focus(self.index)
+        self.focus_obj.set_editing(False)
         self._modified()
 
     def get_edit_text(self):
         return self.focus_obj.get_edit_text()
 
-    def _get(self, pos, editing):
-        name = self.opts[pos]
-        opt = self.master.options._options[name]
-        return OptionItem(self, opt, pos == self.index, self.maxlen, editing)
+    def _get(self, pos):
+        opt = self._opt_refs[pos]
+        cached = self._cache.get(pos)
+        if cached is not None:
+            if cached[0] is opt.value and cached[1].opt is opt:
+                return cached[1]
+            cached[1].release()
+        item = OptionItem(self, opt, pos == self.index, self.maxlen, False)
+        self._cache[pos] = (opt.value, item)
+        return item
 
     def get_focus(self):
+        if self._dirty:
+            self._flush()
         return self.focus_obj, self.index
 
     def set_focus(self, index):
+        if self._dirty:
+            self._flush()
         self.editing = False
-        name = self.opts[index]
-        opt = self.master.options._options[name]
+        opt = self._opt_refs[index]
+        # Moving the focus only restyles the old and new focus rows.
+        prev = self._cache.get(self.index)
+        if prev is not None:
+            prev[1].set_editing(False)
+            prev[1].set_focused(False)
         self.index = index
-        self.focus_obj = self._get(self.index, self.editing)
+        self.focus_obj = self._get(self.index)
+        self.focus_obj.set_focused(True)
         self.help_widget.update_help_text(opt.help)
         self._modified()
 
     def get_next(self, pos):
+        if self._dirty:
+            self._flush()
         if pos >= len(self.opts) - 1:
             return None, None
         pos = pos + 1
-        return self._get(pos, False), pos
+        return self._get(pos), pos
 
     def get_prev(self, pos):
+        if self._dirty:
+            self._flush()
         pos = pos - 1
         if pos < 0:
             return None, None
-        return self._get(pos, False), pos
+        return self._get(pos), pos
 
     def positions(self, reverse=False):
+        if self._dirty:
+            self._flush()
         if reverse:
             return reversed(range(len(self.opts)))
         else:
@@ -167,6 +461,8 @@ class OptionsList(urwid.ListBox):
             signals.status_message.send(message=str(e))
 
     def keypress(self, size, key):
+        # Bring the walker up to date before reading its state.
+        self.walker.get_focus()
         if self.walker.editing:
             if key == "enter":
                 foc, idx = self.get_focus()
@@ -189,14 +485,15 @@ class OptionsList(urwid.ListBox):
                 self.walker._modified()
             elif key == "m_select":
                 foc, idx = self.get_focus()
-                if foc.opt.typespec == bool:
+                kind = self.walker.kinds[foc.opt.name]
+                if kind == KIND_BOOL:
                     self.master.options.toggler(foc.opt.name)()
                     # Bust the focus widget cache
                     self.set_focus(self.walker.index)
-                elif can_edit_inplace(foc.opt):
+                elif kind == KIND_EDITABLE:
                     self.walker.start_editing()
                     self.walker._modified()
-                elif foc.opt.choices:
+                elif kind == KIND_CHOICES:
                     self.master.overlay(
                         overlay.Chooser(
                             self.master,
@@ -206,7 +503,7 @@ class OptionsList(urwid.ListBox):
                             self.master.options.setter(foc.opt.name),
                         )
                     )
-                elif foc.opt.typespec == Sequence[str]:
+                elif kind == KIND_SEQUENCE:
                     self.master.overlay(
                         overlay.OptionsOverlay(
                             self.master,
@@ -224,8 +521,18 @@ class OptionsList(urwid.ListBox):
 class OptionHelp(urwid.Frame):
     def __init__(self, master):
         self.master = master
+        self._wrapper = textwrap.TextWrapper(break_on_hyphens=False)
+        self._wrap_cache: dict[tuple[str, int], list[str]] = {}
+        self._last: tuple[str, int] | None = None
+        self._cols, _ = master.ui.get_cols_rows()
         super().__init__(self.widget(""))
         self.set_active(False)
+        signals.window_resized.connect(self.sig_window_resized)
+
+    def sig_window_resized(self):
+        self._cols, _ = self.master.ui.get_cols_rows()
+        if self._last is not None:
+            self.set_body(self.widget(self._last[0]))
 
     def set_active(self, val):
         h = urwid.Text("Option Help")
@@ -233,10 +540,19 @@ class OptionHelp(urwid.Frame):
         self.header = urwid.AttrWrap(h, style)
 
     def widget(self, txt):
-        cols, _ = self.master.ui.get_cols_rows()
-        return urwid.ListBox([urwid.Text(i) for i in textwrap.wrap(txt, cols)])
+        cols = self._cols
+        key = (txt, cols)
+        lines = self._wrap_cache.get(key)
+        if lines is None:
+            self._wrapper.width = cols
+            lines = self._wrap_cache[key] = self._wrapper.wrap(txt)
+        self._last = key
+        return urwid.ListBox([urwid.Text(i) for i in lines])
 
     def update_help_text(self, txt: str) -> None:
+        # Refocusing the same option is common, e.g. after toggling it.
+        if (txt, self._cols) == self._last:
+            return
         self.set_body(self.widget(txt))
 
 
@@ -256,6 +572,8 @@ class Options(urwid.Pile, layoutwidget.LayoutWidget):
             ]
         )
         self.master = master
+        # (size, item_rows) from the last keypress, see keypress.
+        self._item_rows: tuple[tuple[int, ...], list[int]] | None = None
 
     def current_name(self):
         foc, idx = self.optionslist.get_focus()
@@ -265,13 +583,16 @@ class Options(urwid.Pile, layoutwidget.LayoutWidget):
         if key == "m_next":
             self.focus_position = (self.focus_position + 1) % len(self.widget_list)
             self.widget_list[1].set_active(self.focus_position == 1)
-            key = None
+            self._item_rows = None
+            return None
 
         # This is essentially a copypasta from urwid.Pile's keypress handler.
         # So much for "closed for modification, but open for extension".
         item_rows = None
         if len(size) == 2:
-            item_rows = self.get_item_rows(size, focus=True)
+            if self._item_rows is None or self._item_rows[0] != size:
+                self._item_rows = (size, self.get_item_rows(size, focus=True))
+            item_rows = self._item_rows[1]
         i = self.widget_list.index(self.focus_item)
         tsize = self.get_item_size(size, i, True, item_rows)
         return self.focus_item.keypress(tsize, key)
@@ -63,5 +63,8 @@ pop_view_state = signals.SyncSignal(lambda: None)
 # Fired when the window state changes
 window_refresh = signals.SyncSignal(lambda: None)
 
+# Fired when the terminal is resized
+window_resized = signals.SyncSignal(lambda: None)
+
 # Fired when the key bindings change
 keybindings_change = signals.SyncSignal(lambda: None)
@@ -0,0 +1,374 @@
+import asyncio
+import pprint
+
+import pytest
+import urwid
+
+from mitmproxy import exceptions
+from mitmproxy.tools.console import options
+
+
+def walker(console) -> options.OptionListWalker:
+    console.type("O")
+    return console.window.current_window("options").optionslist.walker
+
+
+def test_item_cache(console):
+    w = walker(console)
+    item, pos = w.get_next(w.index)
+    assert w.get_next(w.index)[0] is item
+
+    w.sig_mod()
+    assert w.get_next(w.index)[0] is not item
+
+
+def test_item_cache_focus(console):
+    w = walker(console)
+    nxt, pos = w.get_next(w.index)
+    assert not nxt.focused
+    w.set_focus(pos)
+    assert w.get_focus()[0] is nxt
+    assert nxt.focused
+    assert not w.get_prev(pos)[0].focused
+
+
+def test_set_focused(console):
+    w = walker(console)
+    foc = w.get_focus()[0]
+    foc.rows((80,))
+    valw = foc._w.contents[1][0]
+    assert valw.attr_map == {None: "option_selected"}
+    foc.set_focused(False)
+    assert foc._w.contents[1][0] is valw
+    assert valw.attr_map == {None: "text"}
+
+
+def test_item_cache_value_change(console):
+    w = walker(console)
+    name = w.opts[w.index]
+    foc = w.get_prev(w.index + 1)[0]
+    assert foc.opt.name == name
+    console.options.update(**{name: not getattr(console.options, name)})
+    assert w.get_prev(w.index + 1)[0] is not foc
+
+
+def test_sig_mod_coalesce(console, monkeypatch):
+    w = walker(console)
+    calls = []
+    monkeypatch.setattr(w, "set_focus", lambda index: calls.append(index))
+    console.options.update(anticache=True, anticomp=True)
+    console.options.listen_port = 1234
+    assert w._dirty
+    assert not calls
+    w._flush()
+    w._flush()
+    assert calls == [w.index]
+    assert not w._dirty
+
+
+def test_display_cache(console):
+    w = walker(console)
+    opt = console.options._options["allow_hosts"]
+    assert w.get_display(opt) == ("", False)
+
+    console.options.allow_hosts = ["example.com", "example.org"]
+    displayval, changed = w.get_display(opt)
+    assert changed
+    assert "example.org" in displayval
+    assert w.get_display(opt)[0] is displayval
+
+
+def test_help_resize(console, monkeypatch):
+    console.type("O")
+    oh = console.window.current_window("options").widget_list[1]
+    oh.update_help_text("foo " * 40)
+    monkeypatch.setattr(console.ui, "get_cols_rows", lambda: (20, 24))
+    assert console.input_filter(["window resize"], []) == ["window resize"]
+    assert oh._cols == 20
+    assert len(oh.body.body) == 8
+
+
+def test_help_wrap_cache(console):
+    console.type("O")
+    oh = console.window.current_window("options").widget_list[1]
+    txt = "a-b " * 100
+    oh.update_help_text(txt)
+    body = oh.body
+    oh.update_help_text(txt)
+    assert oh.body is body
+    assert (txt, oh._cols) in oh._wrap_cache
+    oh.update_help_text("other")
+    assert oh.body is not body
+    oh.update_help_text(txt)
+    assert oh.body is not body
+
+
+def test_sig_mod_new_option(console):
+    w = walker(console)
+    opts = w.opts
+    console.options.anticache = True
+    assert w.opts is opts
+
+    console.options.add_option("zzz_" + "x" * w.maxlen, bool, False, "help")
+    w.get_focus()
+    assert w.opts[-1].startswith("zzz_")
+    assert w.maxlen == len(w.opts[-1])
+
+
+def test_options_keypress(console):
+    console.type("O")
+    o = console.window.current_window("options")
+    assert o.keypress((80, 24), "m_next") is None
+    assert o.focus_position == 1
+    assert o._item_rows is None
+    o.keypress((80, 24), "m_next")
+    assert o.focus_position == 0
+
+    o.keypress((80, 24), "m_end")
+    assert o._item_rows[0] == (80, 24)
+    o.keypress((100, 30), "m_start")
+    assert o._item_rows[0] == (100, 30)
+
+
+@pytest.mark.parametrize(
+    "txt", ["", "foo", "foo bar  ", "x" * 30, "foo bar " * 10, "a\nb", "ünicode"]
+)
+def test_ascii_text(txt):
+    fast, ref = options.AsciiText(txt), urwid.Text(txt)
+    assert fast.pack() == ref.pack()
+    for maxcol in (5, 20, 80):
+        assert fast.get_line_translation(maxcol) == ref.get_line_translation(maxcol)
+        assert fast.render((maxcol,)).text == ref.render((maxcol,)).text
+
+
+def test_item_lazy(console):
+    w = walker(console)
+    item, pos = w.get_next(w.index)
+    assert item._w_cached is None
+    assert item.selectable()
+    assert item._w_cached is None
+    assert item.rows((80,)) == 1
+    assert isinstance(item._w_cached, urwid.Columns)
+
+
+def test_name_widgets(console):
+    w = walker(console)
+    name = w.opts[0]
+    nw = w.get_name_widget(name)
+    assert nw.text == name.ljust(w.maxlen)
+    w.sig_mod()
+    assert w.get_name_widget(name) is nw
+
+    console.options.add_option("y" * (w.maxlen + 1), bool, False, "help")
+    w.get_focus()
+    nw2 = w.get_name_widget(name)
+    assert nw2 is not nw
+    assert nw2.text == name.ljust(w.maxlen)
+
+
+def test_sig_mod_removed_option(console):
+    w = walker(console)
+    for _ in range(2):
+        longest = max(w.opts, key=len)
+        del console.options._options[longest]
+        console.options.add_option("aaa", bool, False, "help")
+        w.get_focus()
+        assert w.opts == sorted(console.options.keys())
+        assert w.maxlen == max(len(i) for i in w.opts)
+        assert sum(w._len_counts.values()) == len(w.opts)
+
+
+def test_keypress_flushes(console):
+    console.type("O")
+    o = console.window.current_window("options")
+    w = o.optionslist.walker
+    for i in range(3):
+        console.options.add_option(f"zzz{i}", bool, False, "help")
+    o.keypress((80, 24), "m_end")
+    for i in range(3):
+        del console.options._options[f"zzz{i}"]
+    w.sig_mod()
+    o.keypress((80, 24), "m_end")
+    assert w.index == len(w.opts) - 1
+    assert w.get_focus()[0].opt.name == w.opts[-1]
+
+
+def test_can_edit_inplace(console):
+    o = console.options._options
+    assert options.can_edit_inplace(o["listen_port"])
+    assert options.can_edit_inplace(o["listen_host"])
+    assert not options.can_edit_inplace(o["console_layout"])
+    assert not options.can_edit_inplace(o["anticache"])
+    assert not options.can_edit_inplace(o["allow_hosts"])
+
+
+def test_editing(console):
+    console.type("O")
+    w = walker(console)
+    w.set_focus(w.opts.index("listen_port"))
+    foc = w.get_focus()[0]
+    foc.rows((80,))
+    name_col = foc._w[0]
+
+    console.type("<enter>")
+    assert w.editing
+    assert w.get_focus()[0] is foc
+    assert foc._w[0] is name_col
+    assert isinstance(foc._w[1], urwid.Edit)
+
+    console.type("<esc>")
+    assert not w.editing
+    assert w.get_focus()[0] is foc
+    assert isinstance(foc._w.contents[1][0], urwid.AttrMap)
+
+    console.type("<enter>1234<enter>")
+    assert not w.editing
+    assert console.options.listen_port == 1234
+    assert "1234" in console.screen_contents()
+
+
+def test_opt_refs_rollback(console):
+    w = walker(console)
+
+    def fail(options, updated):
+        if options.listen_port == 1:
+            raise exceptions.OptionsError("nope")
+
+    console.options.subscribe(fail, ["listen_port"])
+    with pytest.raises(exceptions.OptionsError):
+        console.options.listen_port = 1
+    w.get_focus()
+    pos = w.opts.index("listen_port")
+    assert w._opt_refs[pos] is console.options._options["listen_port"]
+    assert [o.name for o in w._opt_refs] == w.opts
+
+
+@pytest.mark.parametrize(
+    "seq",
+    [
+        ["foo"],
+        ["foo", "bar'", 'b"az', "ünicode", "new\nline"],
+        ["x" * 30] * 3,
+        ["x" * 75, "y" * 76, "z" * 77],
+        ["x" * 100],
+        ("foo", "bar"),
+        [1, 2],
+    ],
+)
+def test_format_sequence(seq):
+    assert options.format_sequence(seq) == pprint.pformat(seq, indent=1)
+
+
+def test_option_kind(console):
+    o = console.options._options
+    assert options.option_kind(o["anticache"]) == options.KIND_BOOL
+    assert options.option_kind(o["console_layout"]) == options.KIND_CHOICES
+    assert options.option_kind(o["listen_port"]) == options.KIND_EDITABLE
+    assert options.option_kind(o["allow_hosts"]) == options.KIND_SEQUENCE
+
+    w = walker(console)
+    assert w.kinds["allow_hosts"] == options.KIND_SEQUENCE
+    console.options.add_option("dict_option", dict, {}, "help")
+    w.get_focus()
+    assert w.kinds["dict_option"] == options.KIND_OTHER
+
+
+def test_value_widget_pool(console):
+    w = walker(console)
+    item = w.get_focus()[0]
+    item.rows((80,))
+    valw = item._w.contents[1][0]
+
+    w.sig_mod()
+    assert w._pool == [valw]
+    item = w.get_focus()[0]
+    item.rows((80,))
+    assert item._w.contents[1][0] is valw
+    assert not w._pool
+    assert valw.base_widget.text == w.get_display(item.opt)[0]
+
+
+def test_item_slots(console):
+    console.type("O")
+    w = walker(console)
+    w.set_focus(w.opts.index("listen_port"))
+    console.type("<enter>1<esc>")
+    item = w.get_focus()[0]
+    item.render((80,))
+    item.set_focused(False)
+    assert item.__dict__ == {}
+
+
+def test_format_sync_without_loop(console):
+    w = walker(console)
+    hosts = [f"host{i}.example.com" for i in range(100)]
+    console.options.allow_hosts = hosts
+    displayval, _ = w.get_display(console.options._options["allow_hosts"])
+    assert displayval == options.format_sequence(hosts)
+
+
+async def test_format_async(console):
+    w = walker(console)
+    w.set_focus(w.opts.index("allow_hosts"))
+    opt = console.options._options["allow_hosts"]
+    hosts = [f"host{i}.example.com" for i in range(100)]
+    console.options.allow_hosts = hosts
+    assert w.get_display(opt)[0] == options.ASYNC_FORMAT_PLACEHOLDER
+    assert w.get_display(opt)[0] == options.ASYNC_FORMAT_PLACEHOLDER
+    assert w._pending == {"allow_hosts"}
+    for _ in range(100):
+        if not w._pending:
+            break
+        await asyncio.sleep(0.01)
+    assert w.get_display(opt)[0] == options.format_sequence(hosts)
+    assert "host0.example.com" in console.screen_contents()
+
+
+async def test_format_async_stale(console):
+    w = walker(console)
+    opt = console.options._options["allow_hosts"]
+    console.options.allow_hosts = ["x"] * 100
+    assert w.get_display(opt)[0] == options.ASYNC_FORMAT_PLACEHOLDER
+    console.options.allow_hosts = ["y"]
+    for _ in range(100):
+        if not w._pending:
+            break
+        await asyncio.sleep(0.01)
+    assert w.get_display(opt)[0] == "['y']"
+
+
+async def test_format_async_unrelated_change(console):
+    w = walker(console)
+    opt = console.options._options["allow_hosts"]
+    hosts = [f"host{i}.example.com" for i in range(100)]
+    console.options.allow_hosts = hosts
+    w.get_display(opt)
+    for _ in range(100):
+        if not w._pending:
+            break
+        await asyncio.sleep(0.01)
+    displayval = w.get_display(opt)[0]
+    assert displayval == options.format_sequence(hosts)
+
+    console.options.anticache = True
+    assert w.get_display(opt)[0] is displayval
+    assert not w._pending
+
+
+async def test_format_async_error(console, monkeypatch, caplog):
+    def fail(seq):
+        raise ValueError("boom")
+
+    monkeypatch.setattr(options, "format_sequence", fail)
+    w = walker(console)
+    opt = console.options._options["allow_hosts"]
+    hosts = [f"host{i}.example.com" for i in range(100)]
+    console.options.allow_hosts = hosts
+    assert w.get_display(opt)[0] == options.ASYNC_FORMAT_PLACEHOLDER
+    for _ in range(100):
+        if not w._pending:
+            break
+        await asyncio.sleep(0.01)
+    assert "boom" in caplog.text
+    assert w.get_display(opt)[0] == pprint.pformat(hosts, indent=1)
+    assert not w._pending